@@ -1,11 +1,24 @@
 import console_game
 import tempest
 import numpy as np
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 
+GAMES = 100
+# The games are played concurrently, so their play-by-play output would only interleave. Only the results are logged.
+GAME_VERBOSITY = 0
 
-def ismcts_agent(iterations):
+log = logging.getLogger('ai_tester')
+
+
+def ismcts_agent(iterations, n_workers=1):
+    """Returns an ISMCTS agent searching with the given number of iterations per play.
+
+    With n_workers, the iterations are split across that many root-parallel trees."""
     def agent(perspective):
-        return tempest.ismcts(perspective, itermax=iterations, verbose=False)
+        return tempest.ismcts(perspective, itermax=iterations, verbose=False, n_workers=n_workers)
 
     return agent
 
@@ -18,13 +31,25 @@ bighead = ismcts_agent(200)
 
 ai_players = [weak_player] * 4 + [strong_player]
 
-total = np.zeros(5)
-for i in range(100):
-    print(f"{i=}")
-    wins, gamepoints, points, declarer_hand = console_game.play_game(ai_player_functions=ai_players, verbose=1)
-    total += np.array(wins)
-    print(total)
 
-total /= 100
-print(total)
+def run_one_game(seed):
+    """Plays a single game seeded with seed, and returns the wins of each player.
+
+    Games are independent of each other, so this is run on a process pool below."""
+    random.seed(seed)
+    wins, gamepoints, points, declarer_hand = console_game.play_game(ai_player_functions=ai_players,
+                                                                     verbose=GAME_VERBOSITY)
+    return wins
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    total = np.zeros(5)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for i, wins in enumerate(executor.map(run_one_game, range(GAMES))):
+            np.add(total, wins, out=total)
+            log.info("i=%d %s", i, total)
 
+    total /= GAMES
+    log.info(total)
@@ -1,6 +1,7 @@
 """A script to play mighty in the console, using the engine.py module."""
 
 import random
+from operator import attrgetter
 from game_logic.cards import *
 from game_logic import engine
 from game_logic import constructs as cs
@@ -11,6 +12,27 @@ from copy import deepcopy
 space = 100
 card_mode = 0  # 0 for standard card string, 1 for unicode representations
 
+ALL_SUITS = tempest.ALL_SUITS
+
+# Sort key ordering cards by suit, then rank.
+_SUIT_RANK_KEY = attrgetter('suit.val', 'rank.val')
+
+
+def _card_and_bit(suit: Suit, rank_val: int) -> tuple:
+    card = Card(suit, Rank(rank_val))
+    return card, tempest.CARD_BITS[card]
+
+
+JOKER = Card.joker()
+JOKER_BIT = tempest.CARD_BITS[JOKER]
+
+# The cards the friend caller falls back to, as (card, card bit) pairs in order of priority.
+FRIEND_RANK_PRIORITY = (1, 13, 12, 11, 10, 9, 8, 7, 6)
+FRIEND_PRIORITY_CARDS = {suit.val: tuple(_card_and_bit(suit, rank_val) for rank_val in FRIEND_RANK_PRIORITY)
+                         for suit in ALL_SUITS}
+NO_TRUMP_FRIEND_PRIORITY_CARDS = tuple(_card_and_bit(suit, rank_val)
+                                       for rank_val in FRIEND_RANK_PRIORITY for suit in ALL_SUITS)
+
 
 def card_repr(card: Card) -> str:
     if card_mode == 1:
@@ -21,6 +43,19 @@ def card_repr(card: Card) -> str:
         return card.__repr__()
 
 
+def longest_suit(hand: list) -> tuple:
+    """Returns the suit with the most cards in hand, and the number of cards of that suit.
+
+    Ties are broken in favor of the suit that comes last in Suit.iter()."""
+    hand_mask = tempest.cards_to_mask(hand)
+    longest_suit_val, longest_suit_num = None, -1
+    for suit_val, suit_mask in tempest.SUIT_MASKS.items():
+        count = tempest.popcount(hand_mask & suit_mask)
+        if count >= longest_suit_num:
+            longest_suit_val, longest_suit_num = suit_val, count
+    return Suit(longest_suit_val), longest_suit_num
+
+
 def random_random_player(pers: cs.Perspective) -> cs.Play:
     """A very random AI player of Mighty."""
 
@@ -38,19 +73,7 @@ def random_random_bidder(pers: cs.Perspective) -> tuple:
     prev_trump = pers.trump_candidate
 
     # Note that you can call one less with a no-trump
-    suit_counts = {}
-    for suit in Suit.iter():
-        count = 0
-        for card in hand:
-            if card.suit == suit:
-                count += 1
-        suit_counts[suit.val] = count
-
-    maximum_suit_num = max(suit_counts.values())
-    trump = None
-    for suit_val in suit_counts:
-        if suit_counts[suit_val] == maximum_suit_num:
-            trump = Suit(suit_val)
+    trump, maximum_suit_num = longest_suit(hand)
 
     for bid in range(1, 21):
         if cs.is_valid_bid(trump, bid, minimum_bid, prev_trump=prev_trump, highest_bid=highest_bid):
@@ -72,19 +95,7 @@ def less_random_bidder(pers: cs.Perspective) -> tuple:
     prev_trump = pers.trump_candidate
 
     # Note that you can call one less with a no-trump
-    suit_counts = {}
-    for suit in Suit.iter():
-        count = 0
-        for card in hand:
-            if card.suit == suit:
-                count += 1
-        suit_counts[suit.val] = count
-
-    maximum_suit_num = max(suit_counts.values())
-    trump = None
-    for suit_val in suit_counts:
-        if suit_counts[suit_val] == maximum_suit_num:
-            trump = Suit(suit_val)
+    trump, maximum_suit_num = longest_suit(hand)
 
     if maximum_suit_num < 4:
         return None, 0
@@ -118,19 +129,7 @@ def selected_bidder(pers: cs.Perspective, selected) -> tuple:
     hand = pers.hand
 
     # Note that you can call one less with a no-trump
-    suit_counts = {}
-    for suit in Suit.iter():
-        count = 0
-        for card in hand:
-            if card.suit == suit:
-                count += 1
-        suit_counts[suit.val] = count
-
-    maximum_suit_num = max(suit_counts.values())
-    trump = None
-    for suit_val in suit_counts:
-        if suit_counts[suit_val] == maximum_suit_num:
-            trump = Suit(suit_val)
+    trump, maximum_suit_num = longest_suit(hand)
 
     return trump, 13
 
@@ -148,8 +147,7 @@ def random_random_exchanger(pers: cs.Perspective) -> tuple:
     """Returns three cards to discard and the trump to change to, on a very random basis."""
     hand = pers.hand
     trump = pers.trump
-    random.shuffle(hand)
-    return hand[:3], trump
+    return random.sample(hand, 3), trump
 
 
 def less_random_exchanger(pers: cs.Perspective) -> tuple:
@@ -179,38 +177,44 @@ def mighty_joker_trump_friend_caller(pers: cs.Perspective) -> cs.FriendCall:
     trump = pers.trump
     mighty = pers.mighty
 
-    if mighty not in hand + kitty:
+    visible = tempest.cards_to_mask(hand) | tempest.cards_to_mask(kitty)
+
+    if not visible & tempest.CARD_BITS[mighty]:
         return cs.FriendCall(0, mighty)
-    elif not any([c.is_joker() for c in hand + kitty]):
-        return cs.FriendCall(0, Card.joker())
+    elif not visible & JOKER_BIT:
+        return cs.FriendCall(0, JOKER)
     else:
         if not trump.is_nosuit():
-            rank_priority_order = [1, 13, 12, 11, 10, 9, 8, 7, 6]
-            for rank_val in rank_priority_order:
-                card = Card(trump, Rank(rank_val))
-                if card not in hand + kitty:
-                    return cs.FriendCall(0, card)
-            raise RuntimeError("Nope. This can't have happened.")
+            priority_cards = FRIEND_PRIORITY_CARDS[trump.val]
         else:
-            rank_priority_order = [1, 13, 12, 11, 10, 9, 8, 7, 6]
-            for rank_val in rank_priority_order:
-                for suit in Suit.iter():
-                    card = Card(suit, Rank(rank_val))
-                    if card not in hand + kitty:
-                        return cs.FriendCall(0, card)
-            raise RuntimeError("Nope. This can't have happened.")
+            priority_cards = NO_TRUMP_FRIEND_PRIORITY_CARDS
+        for card, card_bit in priority_cards:
+            if not visible & card_bit:
+                return cs.FriendCall(0, card)
+        raise RuntimeError("Nope. This can't have happened.")
 
 
 def introduce_hands(hands: list, players: list) -> None:
     """Introduce the hands of players, revealing and hiding upon Enter."""
     for player in players:
         input("Press Enter to reveal Player {}'s hand.".format(player))
-        print(' '.join([card_repr(c) for c in sorted(
-            hands[player], key=lambda c: (c.suit.val, c.rank.val))]))
+        print(' '.join(map(card_repr, sorted(hands[player], key=_SUIT_RANK_KEY))))
         input("Press Enter to clear screen.")
         print('\n' * space)
 
 
+def read_int(prompt: str, lo: int, hi: int, invalid_message="Invalid input.") -> int:
+    """Asks for an integer in range(lo, hi) until one is given, and returns it."""
+    while True:
+        try:
+            value = int(input(prompt))
+        except ValueError:
+            value = None
+        if value is not None and lo <= value < hi:
+            return value
+        print(invalid_message)
+
+
 ################### SETUP ####################
 
 ai_bidders = [less_random_bidder] * 5
@@ -251,26 +255,15 @@ def play_game(ai_num=5,
 
     global space
     if ai_num is None:
-        while True:
-            ai_num = input("How many AI agents?: ")
-            print()
-            if ai_num.isdigit() and int(ai_num) in range(6):
-                ai_num = int(ai_num)
-                break
-            print("Invalid input.")
+        ai_num = read_int("How many AI agents?: ", 0, 6)
+        print()
 
     if ai_num == 5:  # Just to see how long a randomized game lasts.
         start = time()
     else:
         start = None
 
-    ai_players_seed = [True] * ai_num + [False] * (5 - ai_num)
-    random.shuffle(ai_players_seed)
-
-    ai_player_numbers = []
-    for i in range(len(ai_players_seed)):
-        if ai_players_seed[i]:
-            ai_player_numbers.append(i)
+    ai_player_numbers = sorted(random.sample(range(5), ai_num))
 
     ai_declarer_random = random.choice(ai_player_numbers)
 
@@ -278,7 +271,7 @@ def play_game(ai_num=5,
     if len(human_players) == 1:
         space = 0
 
-    ai_nums_str = ', '.join([str(x) for x in ai_player_numbers])
+    ai_nums_str = ', '.join(map(str, ai_player_numbers))
     print2('Player numbers {} are AI agents.'.format(ai_nums_str))
     print2()
 
@@ -355,7 +348,7 @@ def play_game(ai_num=5,
                     mighty_game.get_perspective(mighty_game.declarer))
             else:
                 input('Player {} - Press Enter to reveal the kitty'.format(mighty_game.declarer))
-                print(' '.join([str(c) for c in mighty_game.kitty]))
+                print(' '.join(map(str, mighty_game.kitty)))
                 while True:
                     to_discard = input("Enter the three cards to discard, space separated: ")
                     to_discard = to_discard.split()
@@ -401,20 +394,24 @@ def play_game(ai_num=5,
         elif call_type == cs.CallType.MISS_DEAL_CHECK:
             print2("Miss-deal check in process.")
             deal_miss = [False] * 5
-            for player in range(5):
+            hands = mighty_game.hands
+            mighty = mighty_game.mighty
+            # Only the players whose hands qualify for a miss-deal get to call one.
+            miss_deal_players = [player for player, hand in enumerate(hands)
+                                 if cs.is_miss_deal(hand, mighty)]
+            for player in miss_deal_players:
                 call_miss_deal = False
-                if cs.is_miss_deal(mighty_game.hands[player], mighty_game.mighty):
-                    if player in ai_player_numbers:
-                        call_miss_deal = ai_miss_deal_caller_functions[player](
-                            mighty_game.get_perspective(player))
-                    else:
-                        yes_or_no = input('Player {} - Call miss-deal?: '.format(player))
-                        if yes_or_no.lower() in ('y', 'yes'):
-                            call_miss_deal = True
-                    if call_miss_deal:
-                        print2("Player {} announces miss-deal!".format(player))
-                        print2(' '.join([str(c) for c in mighty_game.hands[player]]))
-                    deal_miss[player] = call_miss_deal
+                if player in ai_player_numbers:
+                    call_miss_deal = ai_miss_deal_caller_functions[player](
+                        mighty_game.get_perspective(player))
+                else:
+                    yes_or_no = input('Player {} - Call miss-deal?: '.format(player))
+                    if yes_or_no.lower() in ('y', 'yes'):
+                        call_miss_deal = True
+                if call_miss_deal:
+                    print2("Player {} announces miss-deal!".format(player))
+                    print2(' '.join(map(str, hands[player])))
+                deal_miss[player] = call_miss_deal
 
             for player in range(5):
                 feedback = mighty_game.miss_deal_check(player, deal_miss[player])
@@ -478,13 +475,9 @@ def play_game(ai_num=5,
                 print("Choose a play from below by index:")
                 for i in range(len(valid_plays)):
                     print(f"{i}: {valid_plays[i]}")
-                while True:
-                    playnum = input("Player {} - Enter play number: ".format(player))
-                    if playnum.isdigit() and 0 <= int(playnum) < len(valid_plays):
-                        playnum = int(playnum)
-                        play = valid_plays[playnum]
-                        break
-                    print("Invalid play.")
+                playnum = read_int("Player {} - Enter play number: ".format(player), 0, len(valid_plays),
+                                   "Invalid play.")
+                play = valid_plays[playnum]
 
             print2(play)
             feedback = mighty_game.play(play)
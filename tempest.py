@@ -5,16 +5,18 @@ This module has been written in mind of being called from tranquil.py, the front
 
 Development started 2019/06/15
 """
-from typing import List
-
 from game_logic import engine
 from game_logic import constructs as cs
 from game_logic.cards import Card, Suit, Rank
-from math import sqrt, log
-from copy import deepcopy
+from copy import copy, deepcopy
+from enum import Enum
 import random
-from functools import reduce
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import sys
+import atexit
+
+from tempest_base import popcount, SQRT_LOG_TABLE, INV_SQRT_TABLE, extend_ucb_tables, InfoSet, TreeInfoDataStructure
 
 
 # TODO: Make use of inferences
@@ -22,6 +24,65 @@ import sys
 # TODO: implement statistics based bidder/exchanger
 
 
+# A single instance of every card, shared by all determinizations rather than constructing new cards each time.
+ALL_CARDS = tuple(Card.iter())
+
+# Every card is assigned a bit, so that a set of cards can be held in a single int.
+CARD_BITS = {card: 1 << i for i, card in enumerate(ALL_CARDS)}
+ALL_CARDS_MASK = (1 << len(CARD_BITS)) - 1
+
+
+def cards_to_mask(cards) -> int:
+    """Returns the bitmask of the given cards."""
+    mask = 0
+    for card in cards:
+        mask |= CARD_BITS[card]
+    return mask
+
+
+def mask_to_cards(mask: int) -> list:
+    """Returns the cards in the given bitmask as a list, in the order of Card.iter()."""
+    cards = []
+    while mask:
+        lowest_bit = mask & -mask
+        cards.append(ALL_CARDS[lowest_bit.bit_length() - 1])
+        mask ^= lowest_bit
+    return cards
+
+
+ALL_SUITS = tuple(Suit.iter())
+SUIT_MASKS = {suit.val: cards_to_mask(Card.suit_iter(suit)) for suit in ALL_SUITS}
+
+# The ranks of the non-joker cards, in the order they first appear in ALL_CARDS.
+ALL_RANKS = tuple({card.rank.val: card.rank for card in ALL_CARDS if not card.is_joker()}.values())
+RANK_MASKS = {rank.val: cards_to_mask(Card.rank_iter(rank)) for rank in ALL_RANKS}
+
+
+def suit_mask(suit: Suit) -> int:
+    """Returns the bitmask of the cards of suit."""
+    if suit.val in SUIT_MASKS:
+        return SUIT_MASKS[suit.val]
+    return cards_to_mask(Card.suit_iter(suit))
+
+
+def rank_mask(rank: Rank) -> int:
+    """Returns the bitmask of the cards of rank."""
+    if rank.val in RANK_MASKS:
+        return RANK_MASKS[rank.val]
+    return cards_to_mask(Card.rank_iter(rank))
+
+
+CARDS_BY_STR = {str(card): card for card in ALL_CARDS}
+
+
+def str_to_card(card_string: str) -> Card:
+    """Returns the card represented by card_string, looking up the canonical card strings before parsing it."""
+    card = CARDS_BY_STR.get(card_string)
+    if card is None:
+        card = Card.str_to_card(card_string)
+    return card
+
+
 class GameState(engine.GameEngine):
     """The class for a state of the Mighty game, in its 'play' stage.
 
@@ -64,14 +125,44 @@ class GameState(engine.GameEngine):
 
     @classmethod
     def from_perspective(cls, perspective, hands, kitty):
-        hands_copy = deepcopy(hands)
-        kitty_copy = deepcopy(kitty)
-        return cls(hands_copy, kitty_copy, deepcopy(perspective.point_cards), deepcopy(perspective.completed_tricks),
-                   perspective.trick_winners[:], deepcopy(perspective.current_trick),
+        # The cards and the plays of the completed tricks are shared, only the lists holding them are copied.
+        # The current trick is still being played into, so it is deep-copied along with its plays.
+        return cls(clone_hands(hands), kitty[:], clone_hands(perspective.point_cards),
+                   clone_tricks(perspective.completed_tricks), perspective.trick_winners[:],
+                   deepcopy(perspective.current_trick),
                    perspective.declarer,
                    deepcopy(perspective.trump), perspective.bid, perspective.friend,
                    deepcopy(perspective.called_friend), perspective.friend_just_revealed)
 
+    def clone(self):
+        """Returns a copy of the state which can be played out independently of the original.
+
+        The fields of the play stage are copied as in from_perspective, sharing the cards and the completed plays.
+        Any other field of the engine is shared only if it holds an immutable value, and deep-copied otherwise."""
+        return self._copy_fields()
+
+    def redeal(self, hands, kitty):
+        """Returns a copy of the state made like clone, holding the given hands and kitty instead of its own.
+
+        Unlike from_perspective, this doesn't run __init__ again, so a search can build the state once and redeal it
+        for every determinization. The tests check that a redealt state matches the one from_perspective builds."""
+        redealt = self._copy_fields(skipped=('hands', 'kitty'))
+        redealt.hands = clone_hands(hands)
+        redealt.kitty = kitty[:]
+        return redealt
+
+    def _copy_fields(self, skipped=()):
+        """Returns a copy of the state with each field copied as clone does, except the skipped ones."""
+        copied = copy(self)
+        for name, value in vars(self).items():
+            if name in skipped:
+                continue
+            if name in STATE_FIELD_COPIERS:
+                setattr(copied, name, STATE_FIELD_COPIERS[name](value))
+            elif not isinstance(value, SHARED_TYPES):
+                setattr(copied, name, deepcopy(value))
+        return copied
+
 
 # This should be all the inferences for all the players grouped adequately
 class Inferences:
@@ -81,13 +172,12 @@ class Inferences:
         self.perspective = pers
         self.inferences = [[Inference(p, True, CardSet()), Inference(p, False, CardSet())] for p in range(5)]
 
-        self.inferences[self.perspective.player][0] += Inference(self.perspective.player, True,
-                                                                 CardSet(', '.join(map(str, self.perspective.hand))))
-        self.inferences[self.perspective.player][1] += Inference(self.perspective.player, False,
-                                                                 CardSet(', '.join(map(str, self.perspective.hand)),
-                                                                         complement=True))
+        hand_mask = cards_to_mask(self.perspective.hand)
+        self.inferences[self.perspective.player][0].add_mask(hand_mask)
+        self.inferences[self.perspective.player][1].add_mask(hand_mask ^ ALL_CARDS_MASK)
 
         # The loop below creates inferences from the previous gameplay
+        mighty = pers.mighty
         tricks = pers.completed_tricks + [pers.current_trick]
         for trick_num in range(len(tricks)):
             trick = tricks[trick_num]
@@ -97,11 +187,15 @@ class Inferences:
                 suit_led = pers.completed_tricks[trick_num][0].suit_led
             else:
                 suit_led = pers.current_trick.suit_led
+            suit_led_mask = None
 
             for play in trick:
                 player, card = play.player, play.card
-                if not card.suit.is_nosuit() and card != pers.mighty and not card.is_joker() and card.suit != suit_led:
-                    self.inferences[player][1] += Inference(player, False, CardSet(suit_led))
+                # Most plays follow suit, so that is checked first.
+                if card.suit != suit_led and card != mighty and not card.is_joker() and not card.suit.is_nosuit():
+                    if suit_led_mask is None:
+                        suit_led_mask = suit_mask(suit_led)
+                    self.inferences[player][1].add_mask(suit_led_mask)
 
     def player_inference(self, player):
         """Returns the inferences for a certain player."""
@@ -118,6 +212,8 @@ class Inferences:
 class Inference:
     """An inference for a player."""
 
+    __slots__ = ('player', 'has', 'cardset')
+
     def __init__(self, player, has: bool, cardset):
         self.player = player
         self.has = has  # When True, player has cardset. When false, player does not have cardset.
@@ -135,277 +231,363 @@ class Inference:
         self.cardset = self.cardset + other.cardset
         return self
 
+    def add_mask(self, mask: int):
+        """Adds the cards of the given bitmask to the cardset of this inference."""
+        self.cardset.mask |= mask
+
     def __repr__(self):
         return "Inference: Player {} {} {}".format(self.player, "has" if self.has else "doesn't have",
-                                                   self.cardset.cards)
+                                                   self.cardset.cards())
+
+
+@lru_cache(maxsize=1024)
+def info_string_to_mask(info_string: str) -> int:
+    """Returns the bitmask of the cards described by info_string, as accepted by CardSet.
+
+    CardSets are mostly described by a handful of strings such as suits and single cards, so the results are cached."""
+    # If a single card is specified
+    if info_string in CARDS_BY_STR:
+        return CARD_BITS[CARDS_BY_STR[info_string]]
+    elif Card.is_cardstr(info_string):
+        return CARD_BITS[Card.str_to_card(info_string)]
+    # If a suit is specified
+    elif Suit.is_suitstr(info_string):
+        return suit_mask(Suit.str_to_suit(info_string))
+    # If a rank is specified
+    elif Rank.is_rankstr(info_string):
+        return rank_mask(Rank.str_to_rank(info_string))
+    else:
+        card_strings = info_string.split(', ')  # Mind the whitespace
+        return cards_to_mask(str_to_card(card_string) for card_string in card_strings)
 
 
 class CardSet:
-    """A class to represent a set of cards."""
+    """A class to represent a set of cards.
+
+    The set is held as a bitmask of the card bits in CARD_BITS."""
+
+    __slots__ = ('mask',)
 
     def __init__(self, info_string=None, complement=False):
-        self.cards_set = set()
+        self.mask = 0
         if info_string is not None and info_string != '':
-            # If a single card is specified
-            if Card.is_cardstr(info_string):
-                self.cards_set.add(Card.str_to_card(info_string))
-            # If a suit is specified
-            elif Suit.is_suitstr(info_string):
-                self.cards_set = set(Card.suit_iter(Suit.str_to_suit(info_string)))
-            # If a rank is specified
-            elif Rank.is_rankstr(info_string):
-                self.cards_set = set(Card.rank_iter(Rank.str_to_rank(info_string)))
-            else:
-                card_strings = info_string.split(', ')  # Mind the whitespace
-                self.cards_set = set([Card.str_to_card(card_string) for card_string in card_strings])
+            self.mask = info_string_to_mask(info_string)
 
         # If complement, complements the set.
         if complement:
-            comp_set = set()
-            for card in Card.iter():
-                if card not in self.cards_set:
-                    comp_set.add(card)
-            self.cards_set = comp_set
-
-    def includes(self, card):
-        """Returns whether card is in CardSet"""
-        return card in self.cards_set
+            self.mask ^= ALL_CARDS_MASK
 
-    def __add__(self, other):
-        new_set = CardSet()
-        new_set.cards_set = self.cards_set.union(other.cards)
+    @classmethod
+    def from_cards(cls, cards, complement=False):
+        """Returns a CardSet of the given cards, without going through their strings."""
+        new_set = cls()
+        new_set.mask = cards_to_mask(cards)
+        if complement:
+            new_set.mask ^= ALL_CARDS_MASK
         return new_set
 
-    def __repr__(self):
-        return 'CardSet object: {' + ', '.join(self.cards_set) + '}'
-
-
-class InfoSet:
-    """The Information Set class, used as the nodes in the ISMCTS game tree."""
-
-    def __init__(self, parent=None, arriving_play=None):
-        self.parent = parent
-        self.arriving_play = arriving_play
-        self.children = []
-        self._play_to_children = {}  # dictionary to map moves to children
-
-        self.reward_sum = 0
-        self.visits = 0
-        self.avails = 1
-
-        self._tried_plays = set()
-
-    def untried_plays(self, legal_plays):
-        """Returns the elements of legal_moves for which this node has no children."""
-        return [play for play in legal_plays if play not in self._tried_plays]
-
-    def ucb_child_select(self, legal_plays, exploration=0.7):
-        """Uses the UCB1 formula to select a child node, filtered by the legal_moves."""
-        legal_children = [self._play_to_children[play] for play in legal_plays]
-
-        # Select child with highest UCB score
-        selected = max(legal_children,
-                       key=lambda c: c.reward_sum / c.visits + exploration * sqrt(log(c.avails) / c.visits))
-
-        # Update availability counts
-        for child in legal_children:
-            child.avails += 1
-
-        return selected
+    @classmethod
+    def from_suit(cls, suit):
+        """Returns a CardSet of all the cards of suit."""
+        new_set = cls()
+        new_set.mask = suit_mask(suit)
+        return new_set
 
-    def add_child(self, play: cs.Play):
-        """Add child to node and return child."""
-        child = InfoSet(self, play)
+    @property
+    def cards_set(self):
+        """The cards of the CardSet, as a set of cards."""
+        return set(self.cards())
 
-        self.children.append(child)
-        self._play_to_children[play] = child
-        self._tried_plays.add(play)
+    def cards(self):
+        """Returns the cards of the CardSet as a list, in the order of Card.iter()."""
+        return mask_to_cards(self.mask)
 
-        return child
+    def includes(self, card):
+        """Returns whether card is in CardSet"""
+        return bool(self.mask & CARD_BITS[card])
 
-    def update(self, rewards: list):
-        """Update this node's reward_sum and visit count based on the rewards of a rollout."""
-        self.visits += 1
-        if self.arriving_play is not None:
-            self.reward_sum += rewards[self.arriving_play.player]
+    def __add__(self, other):
+        new_set = CardSet()
+        new_set.mask = self.mask | other.mask
+        return new_set
 
     def __repr__(self):
-        return "[Play:{} R/V/A: {}/{}/{}]".format(self.arriving_play, self.reward_sum, self.visits, self.avails)
-
-    def tree_info_constructor(self):
-        if len(self.children) == 0:
-            return TreeInfoDataStructure([[self.visits]])
-        else:
-            tree_info = reduce(lambda x, y: x + y, (child.tree_info_constructor() for child in self.children))
-            tree_info.add_parent(self.visits)
-            return tree_info
-
-    def tree_info(self):
-        header = ' ///// TREE INFO ///////////////////\n'
-        play_info_str = ' | '.join(repr(child.arriving_play) for child in self.children)
-        tree_info_str = str(self.tree_info_constructor())
-        footer = '\n ///////////////////////////////////'
-        return header + play_info_str + '\n' + tree_info_str + footer
+        return 'CardSet object: {' + ', '.join(map(str, self.cards())) + '}'
 
 
-class TreeInfoDataStructure:
-    """Data structure representing a tree_info data."""
-
-    def __init__(self, layers: List[List[int]]):
-        """Note: empty nodes must be represented by -1"""
-        assert all(len(layer) == len(layers[0]) for layer in layers)
-        self.layers = layers
-
-    def depth(self):
-        return len(self.layers)
-
-    def width(self):
-        return len(self.layers[0])
-
-    def add_parent(self, parent_visits):
-        parent_layer = [parent_visits] + [-1] * (self.width() - 1)
-        self.layers = [parent_layer] + self.layers
-
-    def __add__(self, other):
-        """Adds together the layers, layer by layer."""
-        if not isinstance(other, TreeInfoDataStructure):
-            raise TypeError("TreeInfoDataStructure can only be added with another of its type")
-        layer_count = max(self.depth(), other.depth())
-        my_layers = self.layers + [[-1] * self.width() for _ in range(layer_count - self.depth())]
-        other_layers = other.layers + [[-1] * other.width() for _ in range(layer_count - other.depth())]
-        merged_layers = []
-        for i in range(layer_count):
-            merged_layers.append(my_layers[i] + other_layers[i])
-        return TreeInfoDataStructure(merged_layers)
-
-    def __str__(self):
-        def padding(width_location):
-            max_digits = 1
-            for layer in self.layers:
-                value = layer[width_location]
-                if value >= 0:
-                    max_digits = max(max_digits, len(str(value)))
-            return max_digits
-
-        layer_strings = []
-        for layer in self.layers:
-            layer_string_builder = []
-            for i, value in enumerate(layer):
-                if value >= 0:
-                    layer_string_builder.append(f"{value:<{padding(i)}}")
-                else:
-                    layer_string_builder.append(' ' * padding(i))
-            layer_strings.append(' '.join(layer_string_builder))
-        return '\n'.join(layer_strings)
-
-
-def determinize(perspective: cs.Perspective, mode=0) -> GameState:
+def determinize(perspective: cs.Perspective, mode=0, rng=random, base_state=None) -> GameState:
     """Determinize the given perspective into a deterministic state.
 
     The mode parameter determines the way in which determinization happens.
+    The hidden cards are shuffled with rng, which may be a random.Random instance or the random module itself.
+    If base_state is given, it must be a state determinized from the same perspective, and it is redealt instead of
+    building a new state.
     """
     if mode == 0:
         is_declarer = perspective.player == perspective.declarer
 
-        played_cards = set()
+        # The cards the player has seen, as a bitmask.
+        seen_mask = cards_to_mask(perspective.hand)
         for trick in perspective.completed_tricks:
-            for play in trick:
-                played_cards.add(play.card)
-        for play in perspective.current_trick:
-            played_cards.add(play.card)
-        for card in perspective.hand:
-            played_cards.add(card)
+            seen_mask |= cards_to_mask(play.card for play in trick)
+        seen_mask |= cards_to_mask(play.card for play in perspective.current_trick)
         if is_declarer:
-            for card in perspective.kitty:
-                played_cards.add(card)
+            seen_mask |= cards_to_mask(perspective.kitty)
 
-        unplayed_cards = []
-        for card in Card.iter():
-            if card not in played_cards:
-                unplayed_cards.append(card)
-        random.shuffle(unplayed_cards)
-        determinized_hands = [[] for _ in range(5)]
+        unplayed_cards = mask_to_cards(seen_mask ^ ALL_CARDS_MASK)
+        rng.shuffle(unplayed_cards)
+        determinized_hands = [None] * 5
 
         if not is_declarer:
             assert len(unplayed_cards) == sum(perspective.hand_sizes) - len(perspective.hand) + 3
         else:
             assert len(unplayed_cards) == sum(perspective.hand_sizes) - len(perspective.hand)
 
+        dealt = 0
         for player in range(5):
             if player != perspective.player:
                 hand_size = perspective.hand_sizes[player]
-                for _ in range(hand_size):
-                    determinized_hands[player].append(unplayed_cards.pop())
+                determinized_hands[player] = unplayed_cards[dealt:dealt + hand_size]
+                dealt += hand_size
         determinized_hands[perspective.player] = perspective.hand
 
         if not is_declarer:
-            determinized_kitty = unplayed_cards
+            determinized_kitty = unplayed_cards[dealt:]
         else:
             determinized_kitty = perspective.kitty
 
+        if base_state is not None:
+            return base_state.redeal(determinized_hands, determinized_kitty)
         determinized_state = GameState.from_perspective(perspective, determinized_hands, determinized_kitty)
         return determinized_state
     else:
         raise NotImplementedError
 
 
-def copy_list(original: list) -> list:
-    """Recursively copies n-dimensional list and returns the copy.
+def clone_hands(hands: list) -> list:
+    """Copies a list of lists of cards, such as the hands or the point cards of the players."""
+    return [hand[:] for hand in hands]
 
-    Slower than list slicing, faster than copy.deepcopy.
-    """
-    copied = []
-    for x in original:
-        if not isinstance(x, list):
-            copied.append(x)
-        else:
-            copied.append(copy_list(x))
-    return copied
+
+def clone_tricks(tricks: list) -> list:
+    """Copies a list of tricks. The tricks are copied with copy, which keeps the type of the trick."""
+    return [copy(trick) for trick in tricks]
+
+
+# How GameState.clone copies each field of the play stage.
+# The current trick is still being played into, so it is deep-copied along with its plays.
+STATE_FIELD_COPIERS = {
+    'hands': clone_hands,
+    'kitty': copy,
+    'point_cards': clone_hands,
+    'completed_tricks': clone_tricks,
+    'trick_winners': copy,
+    'current_trick': deepcopy,
+}
+
+# Values of these types are shared by the copies of a state. Cards are shared like in the hands.
+SHARED_TYPES = (int, float, str, type(None), Enum, Card)
+
+
+def simulate(state: GameState, rng=random, rollouts_per_leaf=1) -> list:
+    """Returns the mean gamepoints rewarded to each player over rollouts_per_leaf random rollouts from state.
+
+    The rollouts are played one after another, not in parallel.
+    The last rollout plays out state itself, the others play out clones of it."""
+    if rollouts_per_leaf == 1:
+        return rollout(state, rng)
+    return mean_rewards([rollout(state.clone(), rng) for _ in range(rollouts_per_leaf - 1)] + [rollout(state, rng)])
+
+
+def mean_rewards(rewards_list: list) -> list:
+    """Returns the mean reward of each player over the given lists of rewards. A single list is returned as it is."""
+    if len(rewards_list) == 1:
+        return rewards_list[0]
+    return [sum(player_rewards) / len(rewards_list) for player_rewards in zip(*rewards_list)]
+
+
+def rollout(state: GameState, rng=random) -> list:
+    """Plays random legal plays until the end of the game, and returns the gamepoints rewarded to each player.
+
+    The plays are chosen with rng, which may be a random.Random instance or the random module itself."""
+    # Local names for the calls made at every play of the rollout
+    choice = rng.choice
+    get_legal_plays = state.get_legal_plays
+    play = state.play
+    play_calltype = cs.CallType.PLAY
+
+    while state.next_calltype == play_calltype:
+        play(choice(get_legal_plays()))
+    return state.gamepoints_rewarded
+
+
+# The worker pool of root-parallel searches, with its number of workers. Created on first use and kept for later moves.
+# It is replaced when a search asks for a different number of workers, and shut down at exit.
+_search_pool = None
+_search_pool_workers = 0
+
+
+def _get_search_pool(n_workers: int) -> ProcessPoolExecutor:
+    """Returns the worker pool for root-parallel searches, creating it if it has no n_workers workers yet."""
+    global _search_pool, _search_pool_workers
+    if _search_pool is None or _search_pool_workers != n_workers:
+        shutdown_search_pool()
+        _search_pool = ProcessPoolExecutor(max_workers=n_workers)
+        _search_pool_workers = n_workers
+    return _search_pool
+
+
+def shutdown_search_pool() -> None:
+    """Shuts down the worker pool of root-parallel searches, if there is one. A later search creates a new pool."""
+    global _search_pool, _search_pool_workers
+    if _search_pool is not None:
+        _search_pool.shutdown()
+        _search_pool = None
+        _search_pool_workers = 0
+
+
+atexit.register(shutdown_search_pool)
 
 
-def ismcts(perspective: cs.Perspective, itermax: int = 50, verbose=False, biased=False) -> cs.Play:
-    """Performs an ISMCTS search from the given perspective and returns the best move after itermax iterations."""
+def _ismcts_worker(perspective: cs.Perspective, itermax: int, seed: int, biased=False, rollouts_per_leaf=1,
+                   expand_all=False) -> dict:
+    """Searches an independent tree with its own random seed.
 
+    Returns a dictionary mapping each play at the root to its visit count and reward sum.
+    Only these are sent back rather than the whole tree, to keep what is pickled small."""
     root_node = InfoSet()
+    ismcts(perspective, itermax, biased=biased, rollouts_per_leaf=rollouts_per_leaf, root_node=root_node, seed=seed,
+           expand_all=expand_all)
+    return {play: (child.visits, child.reward_sum) for play, child in root_node.children.items()}
+
+
+def root_parallel_search(perspective: cs.Perspective, itermax: int, n_workers: int, biased=False,
+                         rollouts_per_leaf=1, rng=random, expand_all=False) -> dict:
+    """Splits itermax iterations across n_workers independent trees searched in worker processes.
+
+    The seeds of the trees are drawn from rng.
+
+    Returns a dictionary mapping each play at the root to its visit count and reward sum, summed over the trees."""
+    pool = _get_search_pool(n_workers)
+
+    # Forked workers inherit the parent's random state, so each tree is given its own seed.
+    iters_per_worker = max(1, itermax // n_workers)
+    futures = [pool.submit(_ismcts_worker, perspective, iters_per_worker, rng.getrandbits(64), biased,
+                           rollouts_per_leaf, expand_all) for _ in range(n_workers)]
+
+    root_stats = {}
+    for future in futures:
+        for play, (visits, reward_sum) in future.result().items():
+            total_visits, total_reward_sum = root_stats.get(play, (0, 0))
+            root_stats[play] = (total_visits + visits, total_reward_sum + reward_sum)
+    return root_stats
+
+
+def ismcts(perspective: cs.Perspective, itermax: int = 50, verbose=False, biased=False, return_root_counts=False,
+           rollouts_per_leaf=1, root_node=None, n_workers=1, seed=None, expand_all=False):
+    """Performs an ISMCTS search from the given perspective and returns the best move after itermax iterations.
+
+    Each expanded leaf is evaluated with the mean rewards of rollouts_per_leaf random rollouts.
+    If expand_all is True, each iteration expands every untried play of the node it reaches rather than a random one.
+    Each new child is evaluated separately, and the mean of their rewards is backpropagated from the node, once.
+    An iteration still adds a single visit to the root. A node's visits are then no longer the sum of its children's:
+    the children expanded together have a visit each, while their parent got one for all of them. The counts of the
+    tree info don't add up in this mode.
+
+    If root_node is given, the search grows that tree instead of a new one, so that the caller can read it afterwards.
+    It must be a new InfoSet.
+
+    If n_workers is more than 1, the iterations are split across that many independent trees searched in parallel,
+    and the play with the most visits summed over the trees is chosen. root_node and verbose are then not supported.
+
+    If return_root_counts is True, a dictionary mapping each play at the root to its visit count is returned instead.
+
+    The search draws its random numbers from its own random.Random seeded with seed. If seed is None, the seed is drawn
+    from the random module, so that seeding the random module still makes the search reproducible.
+    """
+
+    # The legal plays at the root only depend on the searching player's own hand, which is the same in every
+    # determinization. Hence they are computed once here, rather than once per iteration.
+    root_legal_plays = cs.legal_plays(perspective.player, perspective.hand, perspective.completed_tricks,
+                                      perspective.current_trick, perspective.trump, perspective.next_calltype,
+                                      perspective.leader)
+
+    # Checking if there's only a single available move
+    if len(root_legal_plays) == 1:
+        if verbose:
+            print("Single move found - skipping ISMCTS")
+        if return_root_counts:
+            return {root_legal_plays[0]: 1}
+        return root_legal_plays[0]
+
+    rng = random.Random(seed if seed is not None else random.getrandbits(64))
+
+    if n_workers > 1:
+        if root_node is not None:
+            raise ValueError("root_node is not supported by a root-parallel search")
+        root_stats = root_parallel_search(perspective, itermax, n_workers, biased, rollouts_per_leaf, rng, expand_all)
+        if return_root_counts:
+            return {play: visits for play, (visits, reward_sum) in root_stats.items()}
+        return max(root_stats, key=lambda play: root_stats[play][0])
+
+    if root_node is None:
+        root_node = InfoSet()
+
+    # Only the hidden cards differ between determinizations, so the state is built once and redealt every iteration.
+    base_state = determinize(perspective, biased, rng)
+
     for i in range(itermax):
         node_head = root_node
 
         # Determinization
-        determinized_state = determinize(perspective, biased)
-
-        # Checking if there's only a single available move
-        legal_plays = determinized_state.get_legal_plays()
-        if len(legal_plays) == 1:
-            if verbose:
-                print("Single move found - skipping ISMCTS")
-            return legal_plays[0]
+        determinized_state = determinize(perspective, biased, rng, base_state)
+        legal_plays = root_legal_plays
 
         # Selection
-        while legal_plays and len(node_head.untried_plays(legal_plays)) == 0:
+        untried_plays = node_head.untried_plays(legal_plays)
+        while legal_plays and not untried_plays:
             # this node is fully expanded and non-terminal
             node_head = node_head.ucb_child_select(legal_plays)
             determinized_state.play(node_head.arriving_play)
             legal_plays = determinized_state.get_legal_plays()
-
-        # Expansion
-        untried_plays = node_head.untried_plays(legal_plays)
-        if untried_plays:  # if we can expand (i.e. state/node is non-terminal)
-            chosen_play = random.choice(untried_plays)
+            untried_plays = node_head.untried_plays(legal_plays)
+
+        # Expansion, into the new children to simulate from and their states
+        if not untried_plays:  # the node is terminal
+            leaves = []
+        elif expand_all:
+            leaves = []
+            for play in untried_plays:
+                leaf_state = determinized_state.clone()
+                leaf_state.play(play)
+                leaves.append((node_head.add_child(play), leaf_state))
+        else:
+            chosen_play = rng.choice(untried_plays)
             determinized_state.play(chosen_play)
-            node_head = node_head.add_child(chosen_play)  # add child and descend tree
+            leaves = [(node_head.add_child(chosen_play), determinized_state)]  # add child and descend tree
 
-        # Simulation
-        while determinized_state.next_calltype == cs.CallType.PLAY:
-            legal_plays = determinized_state.get_legal_plays()
-            determinized_state.play(random.choice(legal_plays))
+        # Simulation, with the rewards of several new children averaged
+        if not leaves:
+            rewards = simulate(determinized_state, rng, rollouts_per_leaf)
+        else:
+            leaf_rewards = []
+            for leaf, leaf_state in leaves:
+                rewards = simulate(leaf_state, rng, rollouts_per_leaf)
+                leaf.update(rewards)
+                leaf_rewards.append(rewards)
+            rewards = mean_rewards(leaf_rewards)
 
         # Backpropagation
-        while node_head is not None:
-            node_head.update(determinized_state.gamepoints_rewarded)
-            node_head = node_head.parent
+        node = node_head
+        while node is not None:
+            node.update(rewards)
+            node = node.parent
 
     if verbose:
         print(root_node.tree_info(), file=sys.stderr)
 
-    best_node = max(root_node.children, key=lambda child: child.visits)
+    if return_root_counts:
+        return {play: child.visits for play, child in root_node.children.items()}
+
+    best_node = max(root_node.children.values(), key=lambda child: child.visits)
     return best_node.arriving_play
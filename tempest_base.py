@@ -0,0 +1,174 @@
+"""The parts of Tranquil Tempest that don't depend on the game engine
+
+This module holds the ISMCTS tree nodes, the UCB tables they select with, and bit counting for card bitmasks.
+None of these need the game_logic submodule, so they can be imported and tested without it.
+tempest.py re-exports all of them.
+"""
+from typing import List
+from math import sqrt, log
+
+
+if hasattr(int, 'bit_count'):
+    def popcount(mask: int) -> int:
+        """Returns the number of cards in the given bitmask."""
+        return mask.bit_count()
+else:  # int.bit_count is new in Python 3.10
+    def popcount(mask: int) -> int:
+        """Returns the number of cards in the given bitmask."""
+        return bin(mask).count('1')
+
+
+# The UCB formula's exploration term sqrt(log(avails) / visits) is computed as sqrt(log(avails)) * (1 / sqrt(visits)),
+# with both factors looked up from these tables indexed by the integer count.
+# Grown by extend_ucb_tables as the counts grow. Counts of 0 are never looked up.
+SQRT_LOG_TABLE = [float('nan')]
+INV_SQRT_TABLE = [float('nan')]
+
+
+def extend_ucb_tables(size: int) -> None:
+    """Makes SQRT_LOG_TABLE and INV_SQRT_TABLE hold the values for at least the integers below size."""
+    start = len(SQRT_LOG_TABLE)
+    SQRT_LOG_TABLE.extend(sqrt(log(n)) for n in range(start, size))
+    INV_SQRT_TABLE.extend(1 / sqrt(n) for n in range(start, size))
+
+
+class InfoSet:
+    """The Information Set class, used as the nodes in the ISMCTS game tree."""
+
+    __slots__ = ('parent', 'arriving_play', 'children', 'reward_sum', 'visits', 'avails')
+
+    def __init__(self, parent=None, arriving_play=None):
+        self.parent = parent
+        self.arriving_play = arriving_play
+        self.children = {}  # dictionary to map plays to children
+
+        self.reward_sum = 0
+        self.visits = 0
+        self.avails = 1
+
+    def untried_plays(self, legal_plays):
+        """Returns the elements of legal_moves for which this node has no children."""
+        children = self.children
+        return [play for play in legal_plays if play not in children]
+
+    def ucb_child_select(self, legal_plays, exploration=0.7):
+        """Uses the UCB1 formula to select a child node, filtered by the legal_moves."""
+        children = self.children
+
+        # A child is available at most once per visit of this node, plus the count it starts with,
+        # and is visited at most once per visit of this node. So the tables cover the children once they cover that.
+        if self.visits + 1 >= len(SQRT_LOG_TABLE):
+            extend_ucb_tables(2 * (self.visits + 2))
+        sqrt_log_table = SQRT_LOG_TABLE
+        inv_sqrt_table = INV_SQRT_TABLE
+
+        # Select child with highest UCB score, updating availability counts along the way.
+        # Each score only depends on the child's own availability count before the update.
+        selected = None
+        best_score = -float('inf')
+        for play in legal_plays:
+            child = children[play]
+            visits = child.visits
+            score = child.reward_sum / visits + exploration * sqrt_log_table[child.avails] * inv_sqrt_table[visits]
+            child.avails += 1
+            if score > best_score:
+                selected = child
+                best_score = score
+
+        return selected
+
+    def add_child(self, play):
+        """Add child to node and return child."""
+        child = InfoSet(self, play)
+
+        self.children[play] = child
+
+        return child
+
+    def update(self, rewards: list):
+        """Update this node's reward_sum and visit count based on the rewards of a rollout."""
+        self.visits += 1
+        if self.arriving_play is not None:
+            self.reward_sum += rewards[self.arriving_play.player]
+
+    def __repr__(self):
+        return "[Play:{} R/V/A: {}/{}/{}]".format(self.arriving_play, self.reward_sum, self.visits, self.avails)
+
+    def tree_info_constructor(self):
+        """Lays out the visit counts of the tree, one layer per depth and one column per leaf.
+
+        Each node is placed in the column of its leftmost leaf. The tree is walked with an explicit stack,
+        so deep trees don't run into the recursion limit."""
+        cells = []  # (depth, column, visits) of every node
+        leaf_count = 0
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            cells.append((depth, leaf_count, node.visits))
+            if node.children:
+                # Reversed, so that the children are popped in order
+                stack.extend((child, depth + 1) for child in reversed(list(node.children.values())))
+            else:
+                leaf_count += 1
+
+        layers = [[-1] * leaf_count for _ in range(max(depth for depth, _, _ in cells) + 1)]
+        for depth, column, visits in cells:
+            layers[depth][column] = visits
+        return TreeInfoDataStructure(layers)
+
+    def tree_info(self):
+        header = ' ///// TREE INFO ///////////////////\n'
+        play_info_str = ' | '.join(repr(play) for play in self.children)
+        tree_info_str = str(self.tree_info_constructor())
+        footer = '\n ///////////////////////////////////'
+        return header + play_info_str + '\n' + tree_info_str + footer
+
+
+class TreeInfoDataStructure:
+    """Data structure representing a tree_info data."""
+
+    def __init__(self, layers: List[List[int]]):
+        """Note: empty nodes must be represented by -1"""
+        assert all(len(layer) == len(layers[0]) for layer in layers)
+        self.layers = layers
+
+    def depth(self):
+        return len(self.layers)
+
+    def width(self):
+        return len(self.layers[0])
+
+    def add_parent(self, parent_visits):
+        parent_layer = [parent_visits] + [-1] * (self.width() - 1)
+        self.layers = [parent_layer] + self.layers
+
+    def __add__(self, other):
+        """Adds together the layers, layer by layer."""
+        if not isinstance(other, TreeInfoDataStructure):
+            raise TypeError("TreeInfoDataStructure can only be added with another of its type")
+        layer_count = max(self.depth(), other.depth())
+        my_layers = self.layers + [[-1] * self.width() for _ in range(layer_count - self.depth())]
+        other_layers = other.layers + [[-1] * other.width() for _ in range(layer_count - other.depth())]
+        merged_layers = []
+        for i in range(layer_count):
+            merged_layers.append(my_layers[i] + other_layers[i])
+        return TreeInfoDataStructure(merged_layers)
+
+    def __str__(self):
+        # The width of each column is that of its widest value, found once per column rather than once per cell.
+        paddings = [1] * self.width()
+        for layer in self.layers:
+            for i, value in enumerate(layer):
+                if value >= 0:
+                    paddings[i] = max(paddings[i], len(str(value)))
+
+        layer_strings = []
+        for layer in self.layers:
+            layer_string_builder = []
+            for i, value in enumerate(layer):
+                if value >= 0:
+                    layer_string_builder.append(f"{value:<{paddings[i]}}")
+                else:
+                    layer_string_builder.append(' ' * paddings[i])
+            layer_strings.append(' '.join(layer_string_builder))
+        return '\n'.join(layer_strings)
@@ -0,0 +1,192 @@
+"""Regression tests for tempest.py.
+
+These need the game_logic submodule, and are skipped when it is not checked out.
+Run with: python -m unittest
+"""
+import random
+import unittest
+
+try:
+    import console_game
+    import tempest
+    from game_logic import constructs as cs
+    from game_logic.cards import Card, Suit, Rank
+except ImportError:
+    raise unittest.SkipTest("the game_logic submodule is not checked out")
+
+
+class _ReachedPlay(Exception):
+    def __init__(self, perspective):
+        super().__init__()
+        self.perspective = perspective
+
+
+def perspective_at_play(play_number=12):
+    """Plays a silent game of random players and returns the perspective of the play_number-th play.
+
+    The game is abandoned at that play."""
+    plays_made = []
+
+    def player(perspective):
+        if len(plays_made) == play_number:
+            raise _ReachedPlay(perspective)
+        plays_made.append(None)
+        return console_game.random_random_player(perspective)
+
+    try:
+        console_game.play_game(5, ai_player_functions=[player] * 5, verbose=0)
+    except _ReachedPlay as reached:
+        return reached.perspective
+    raise AssertionError(f"the game ended before play {play_number}")
+
+
+def plays_snapshot(plays) -> list:
+    return [(play.player, play.card, str(play)) for play in plays]
+
+
+def perspective_snapshot(perspective) -> tuple:
+    """The fields of a perspective that a search copies from, in a form that can be compared later."""
+    return (perspective.hand[:], [plays_snapshot(trick) for trick in perspective.completed_tricks],
+            plays_snapshot(perspective.current_trick), perspective.trick_winners[:], str(perspective.trump),
+            str(perspective.called_friend), perspective.next_calltype, perspective.leader)
+
+
+def state_snapshot(state) -> tuple:
+    """The fields of a state that playing it out could change, in a form that can be compared later."""
+    return ([hand[:] for hand in state.hands], state.kitty[:], [cards[:] for cards in state.point_cards],
+            [plays_snapshot(trick) for trick in state.completed_tricks], plays_snapshot(state.current_trick),
+            state.trick_winners[:], state.next_calltype, state.leader, state.friend, str(state.trump),
+            str(state.called_friend), state.friend_just_revealed, list(state.gamepoints_rewarded))
+
+
+# The strings of the ranks of the deck that are parsed as ranks
+RANK_STRINGS = sorted({str(card.rank) for card in tempest.ALL_CARDS if Rank.is_rankstr(str(card.rank))})
+
+
+class CardSetTest(unittest.TestCase):
+    def test_cards_are_listed_in_deck_order(self):
+        picked = [tempest.ALL_CARDS[i] for i in (40, 3, 17, 52, 0)]
+        self.assertEqual(tempest.CardSet.from_cards(picked).cards(),
+                         [tempest.ALL_CARDS[i] for i in (0, 3, 17, 40, 52)])
+        self.assertEqual(tempest.CardSet.from_cards(picked, complement=True).cards(),
+                         [card for card in Card.iter() if card not in picked])
+        self.assertEqual(tempest.CardSet().cards(), [])
+
+    def test_info_strings_parse_to_their_cards(self):
+        picked = [tempest.ALL_CARDS[i] for i in (0, 7, 30)]
+        expected = {None: [], '': [], str(picked[1]): [picked[1]], ', '.join(map(str, reversed(picked))): picked}
+        for suit in tempest.ALL_SUITS:
+            if Suit.is_suitstr(str(suit)):
+                expected[str(suit)] = [card for card in tempest.ALL_CARDS
+                                       if not card.is_joker() and str(card.suit) == str(suit)]
+        joker_rank_string = next(str(card.rank) for card in tempest.ALL_CARDS if card.is_joker())
+        for rank_string in RANK_STRINGS + [joker_rank_string]:
+            expected[rank_string] = [card for card in tempest.ALL_CARDS if str(card.rank) == rank_string]
+
+        for _ in range(2):  # The second time, the masks come from the cache
+            for info_string, cards in expected.items():
+                self.assertEqual(tempest.CardSet(info_string).cards(), cards, info_string)
+                self.assertEqual(tempest.CardSet(info_string, complement=True).cards(),
+                                 [card for card in tempest.ALL_CARDS if card not in cards], info_string)
+
+    def test_add_does_not_mutate(self):
+        first_suit, second_suit = [suit for suit in tempest.ALL_SUITS if not suit.is_nosuit()][:2]
+        cardset = tempest.CardSet.from_suit(first_suit)
+        shared = cardset
+        cardset += tempest.CardSet.from_suit(second_suit)
+        self.assertEqual(shared.mask, tempest.suit_mask(first_suit))
+        self.assertEqual(cardset.mask, tempest.suit_mask(first_suit) | tempest.suit_mask(second_suit))
+
+    def test_inference_add_does_not_mutate_the_added_cardsets(self):
+        first_suit, second_suit = [suit for suit in tempest.ALL_SUITS if not suit.is_nosuit()][:2]
+        cardset = tempest.CardSet.from_suit(first_suit)
+        inference = tempest.Inference(0, False, cardset)
+        inference += tempest.Inference(0, False, tempest.CardSet.from_suit(second_suit))
+        self.assertEqual(cardset.mask, tempest.suit_mask(first_suit))
+        self.assertEqual(inference.cardset.mask, tempest.suit_mask(first_suit) | tempest.suit_mask(second_suit))
+
+    def test_rank_masks_split_the_non_joker_cards(self):
+        union = 0
+        for rank in tempest.ALL_RANKS:
+            mask = tempest.rank_mask(rank)
+            self.assertEqual(union & mask, 0)
+            self.assertEqual(tempest.CardSet.from_cards(Card.rank_iter(rank)).mask, mask)
+            union |= mask
+        self.assertEqual(union, tempest.cards_to_mask(card for card in tempest.ALL_CARDS if not card.is_joker()))
+
+
+class GameStateTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_search_does_not_change_the_perspective(self):
+        for play_number in (0, 12, 13):
+            perspective = perspective_at_play(play_number)
+            before = perspective_snapshot(perspective)
+            tempest.ismcts(perspective, itermax=20, seed=1)
+            self.assertEqual(perspective_snapshot(perspective), before)
+
+    def test_clone_is_independent(self):
+        state = tempest.determinize(perspective_at_play())
+        before = state_snapshot(state)
+        tempest.rollout(state.clone())
+        self.assertEqual(state_snapshot(state), before)
+        self.assertEqual(state.next_calltype, cs.CallType.PLAY)
+        tempest.rollout(state)
+
+    def test_redeal_leaves_the_base_state_unchanged(self):
+        for play_number in (0, 12, 13):
+            perspective = perspective_at_play(play_number)
+            base_state = tempest.determinize(perspective)
+            before = state_snapshot(base_state)
+            for _ in range(2):
+                state = tempest.determinize(perspective, base_state=base_state)
+                self.assertEqual([len(hand) for hand in state.hands], [len(hand) for hand in base_state.hands])
+                tempest.rollout(state)
+                self.assertEqual(state_snapshot(base_state), before)
+
+    def test_redeal_matches_from_perspective_on_the_same_deal(self):
+        for play_number in (0, 12, 13):
+            perspective = perspective_at_play(play_number)
+            redealt = tempest.determinize(perspective, base_state=tempest.determinize(perspective))
+            built = tempest.GameState.from_perspective(perspective, redealt.hands, redealt.kitty)
+            self.assertEqual(set(vars(redealt)), set(vars(built)))
+            self.assertEqual(state_snapshot(redealt), state_snapshot(built))
+            redealt_fields, built_fields = [(state.declarer, state.bid, str(state.mighty), str(state.ripper))
+                                            for state in (redealt, built)]
+            self.assertEqual(redealt_fields, built_fields)
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_each_iteration_visits_the_root_once(self):
+        perspective = perspective_at_play()
+        for expand_all in (False, True):
+            root_node = tempest.InfoSet()
+            tempest.ismcts(perspective, itermax=20, root_node=root_node, seed=1, expand_all=expand_all)
+            if len(root_node.children) > 1:
+                self.assertEqual(root_node.visits, 20)
+                child_visits = sum(child.visits for child in root_node.children.values())
+                if expand_all:
+                    # The first iteration gives every root play a visit, and each later one visits a single child
+                    self.assertEqual(child_visits, len(root_node.children) + 19)
+                else:
+                    self.assertEqual(child_visits, 20)
+
+    def test_expand_all_expands_every_root_play_in_the_first_iteration(self):
+        perspective = perspective_at_play()
+        root_node = tempest.InfoSet()
+        tempest.ismcts(perspective, itermax=1, root_node=root_node, seed=1, expand_all=True)
+        legal_plays = cs.legal_plays(perspective.player, perspective.hand, perspective.completed_tricks,
+                                     perspective.current_trick, perspective.trump, perspective.next_calltype,
+                                     perspective.leader)
+        if len(legal_plays) > 1:
+            self.assertEqual(set(root_node.children), set(legal_plays))
+            self.assertEqual(root_node.visits, 1)
+            self.assertTrue(all(child.visits == 1 for child in root_node.children.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
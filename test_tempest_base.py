@@ -0,0 +1,75 @@
+"""Tests for tempest_base.py, which run without the game_logic submodule.
+
+Run with: python -m unittest
+"""
+import sys
+import unittest
+from math import sqrt, log
+
+import tempest_base
+
+
+def small_tree():
+    """Returns a hand-built tree with four leaves, whose visit counts have from one to four digits."""
+    root = tempest_base.InfoSet()
+    root.visits = 1200
+    for play, visits, child_visits in (('a', 1000, (995, 4)), ('b', 150, ()), ('c', 49, (48,))):
+        child = root.add_child(play)
+        child.visits = visits
+        for i, grandchild_visits in enumerate(child_visits):
+            child.add_child(f'{play}{i}').visits = grandchild_visits
+    return root
+
+
+class PopcountTest(unittest.TestCase):
+    def test_popcount_counts_the_set_bits(self):
+        self.assertEqual(tempest_base.popcount(0), 0)
+        self.assertEqual(tempest_base.popcount(0b1011), 3)
+        self.assertEqual(tempest_base.popcount(1 << 52), 1)
+        self.assertEqual(tempest_base.popcount((1 << 53) - 1), 53)
+
+
+class InfoSetTest(unittest.TestCase):
+    def test_ucb_tables(self):
+        tempest_base.extend_ucb_tables(1000)
+        for n in range(1, 1000):
+            self.assertAlmostEqual(tempest_base.SQRT_LOG_TABLE[n], sqrt(log(n)))
+            self.assertAlmostEqual(tempest_base.INV_SQRT_TABLE[n], 1 / sqrt(n))
+
+    def test_ucb_child_select(self):
+        # UCB scores with the exploration of 0.7: a 0.964, b 0.734, c 1.499, d 1.038
+        for legal_plays, expected in ((['a', 'b', 'c', 'd'], 'c'), (['a', 'b'], 'a'), (['a', 'b', 'd'], 'd')):
+            parent = tempest_base.InfoSet()
+            parent.visits = 10
+            for play, visits, reward_sum in (('a', 5, 2.5), ('b', 2, 0.0), ('c', 3, 2.7), ('d', 1, 0.0)):
+                child = parent.add_child(play)
+                child.visits, child.reward_sum, child.avails = visits, reward_sum, 9
+
+            self.assertIs(parent.ucb_child_select(legal_plays), parent.children[expected])
+            for play, child in parent.children.items():
+                self.assertEqual(child.avails, 10 if play in legal_plays else 9)
+
+    def test_tree_info_lays_out_the_leaves_side_by_side(self):
+        self.assertEqual(small_tree().tree_info_constructor().layers,
+                         [[1200, -1, -1, -1], [1000, -1, 150, 49], [995, 4, -1, 48]])
+        root = tempest_base.InfoSet()
+        root.visits = 7
+        self.assertEqual(root.tree_info_constructor().layers, [[7]])
+
+    def test_tree_info_constructor_handles_trees_deeper_than_the_recursion_limit(self):
+        root = node = tempest_base.InfoSet()
+        for _ in range(sys.getrecursionlimit() + 100):
+            node = node.add_child('play')
+        layers = root.tree_info_constructor().layers
+        self.assertEqual(len(layers), sys.getrecursionlimit() + 101)
+        self.assertTrue(all(layer == [0] for layer in layers))
+
+    def test_tree_info_str_pads_each_column_to_its_widest_count(self):
+        self.assertEqual(str(small_tree().tree_info_constructor()),
+                         '1200         \n'
+                         '1000   150 49\n'
+                         '995  4     48')
+
+
+if __name__ == '__main__':
+    unittest.main()